@@ -1,21 +1,59 @@
 import os
-from typing import List, Dict, Optional, Tuple
+import asyncio
+from typing import List, Dict, Optional, Tuple, AsyncIterator, Awaitable, Callable, Any
 from datetime import datetime
 from dataclasses import dataclass, asdict
 from collections import deque
+from itertools import islice
 import json
 import logging
+import random
+import time
+import hashlib
+import unicodedata
 
+import httpx
+import numpy as np
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+from langchain_core.prompts import ChatPromptTemplate
 from pinecone import Pinecone, ServerlessSpec
-from openai import OpenAI
+from openai import AsyncOpenAI, RateLimitError, APIConnectionError, InternalServerError
 from pypdf import PdfReader
 import tempfile
 
+from pdf_processing import PdfBatchProcessor
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bound in-flight OpenAI requests so bursts don't trip RPM/TPM limits
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "20"))
+LLM_MAX_RETRIES = 3
+_LLM_SEM = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+_RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
+
+async def _backoff(attempt: int, error: Exception):
+    """Sleep before the next retry; the concurrency slot is not held while waiting"""
+    delay = (2 ** attempt) + random.random()
+    logger.warning(f"OpenAI call failed ({error}), retrying in {delay:.1f}s")
+    await asyncio.sleep(delay)
+
+
+async def call_with_retry(fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+    """Run an OpenAI call under the concurrency limit, retrying 429/5xx with jittered backoff
+
+    Clients are built with max_retries=0 so this is the only retry layer.
+    """
+    for attempt in range(LLM_MAX_RETRIES):
+        try:
+            async with _LLM_SEM:
+                return await fn(*args, **kwargs)
+        except _RETRYABLE_ERRORS as e:
+            if attempt == LLM_MAX_RETRIES - 1:
+                raise
+            await _backoff(attempt, e)
+
 
 @dataclass
 class ChatMessage:
@@ -47,18 +85,20 @@ class AdvancedMemorySystem:
         if is_important:
             self.long_term_memory.append(message)
 
+    def _recent_messages(self, max_messages: int):
+        """Iterate over the last max_messages messages without copying the deque"""
+        start = max(0, len(self.short_term_memory) - max_messages)
+        return islice(self.short_term_memory, start, None)
+
     def get_conversation_history(self, max_messages: int = 10) -> List[Dict]:
         """Get conversation history for context"""
-        messages = list(self.short_term_memory)[-max_messages:]
-        return [msg.to_dict() for msg in messages]
+        return [msg.to_dict() for msg in self._recent_messages(max_messages)]
 
     def get_formatted_history(self, max_messages: int = 10) -> str:
         """Get formatted conversation history for LLM"""
-        messages = list(self.short_term_memory)[-max_messages:]
-        formatted = ""
-        for msg in messages:
-            formatted += f"{msg.role.upper()}: {msg.content}\n"
-        return formatted
+        return "".join(
+            f"{msg.role.upper()}: {msg.content}\n" for msg in self._recent_messages(max_messages)
+        )
 
     def clear(self):
         """Clear all memory"""
@@ -66,15 +106,35 @@ class AdvancedMemorySystem:
 
 
 class InputNormalizer:
-    """Normalize user input using LLM"""
+    """Normalize user input, using the LLM only for input that looks malformed"""
 
-    def __init__(self, openai_client: OpenAI):
+    def __init__(self, openai_client: AsyncOpenAI, max_symbol_ratio: float = 0.2):
         self.client = openai_client
+        self.max_symbol_ratio = max_symbol_ratio
+
+    @staticmethod
+    def _clean(text: str) -> str:
+        """NFC-normalize and collapse whitespace"""
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    def _needs_llm(self, text: str) -> bool:
+        """Very short or symbol-heavy input is worth an LLM round trip"""
+        if len(text) <= 3:
+            return True
+        chars = [ch for ch in text if not ch.isspace()]
+        # Letters, marks (Thai vowels/tones) and digits count as regular text
+        symbols = sum(1 for ch in chars if unicodedata.category(ch)[0] not in "LMN")
+        return symbols > self.max_symbol_ratio * len(chars)
 
-    def normalize(self, text: str) -> str:
+    async def normalize(self, text: str) -> str:
         """Normalize user input"""
+        cleaned = self._clean(text)
+        if not self._needs_llm(cleaned):
+            return cleaned
+
         try:
-            response = self.client.chat.completions.create(
+            response = await call_with_retry(
+                self.client.chat.completions.create,
                 model="gpt-4.1-mini",
                 messages=[
                     {
@@ -95,45 +155,121 @@ class InputNormalizer:
             return text
 
 
+class SemanticCache:
+    """In-memory response cache keyed by query embedding similarity"""
+
+    def __init__(self, dimension: int = 1536, max_size: int = 1024, threshold: float = 0.95):
+        self.threshold = threshold
+        self.max_size = max_size
+        # Ring buffer of unit-normalized query embeddings, evicted FIFO
+        self.mat = np.zeros((max_size, dimension), dtype=np.float32)
+        self.entries: List[Optional[Tuple[str, str]]] = [None] * max_size  # (response, context_hash)
+        self.size = 0
+        self._next = 0
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def lookup(self, query_vector: List[float], context_hash: str) -> Optional[str]:
+        """Return a cached response for a near-identical query with the same context"""
+        # Only rows cached under the same context can answer this query
+        rows = np.flatnonzero(np.fromiter(
+            (entry[1] == context_hash for entry in self.entries[:self.size]), dtype=bool, count=self.size
+        ))
+        if not rows.size:
+            return None
+
+        # float32 BLAS matvec; NumPy has no int8 kernel that beats it
+        sims = self.mat[rows] @ self._normalize(query_vector)
+        best = int(sims.argmax())
+        if sims[best] > self.threshold:
+            return self.entries[rows[best]][0]
+        return None
+
+    def add(self, query_vector: List[float], response: str, context_hash: str):
+        """Store a response, evicting the oldest entry when full"""
+        self.mat[self._next] = self._normalize(query_vector)
+        self.entries[self._next] = (response, context_hash)
+        self._next = (self._next + 1) % self.max_size
+        self.size = min(self.size + 1, self.max_size)
+
+    def clear(self):
+        """Drop all cached responses"""
+        self.entries = [None] * self.max_size
+        self.size = 0
+        self._next = 0
+
+
 class PineconeRAG:
     """Pinecone Vector Database RAG System"""
 
-    def __init__(self, api_key: str, index_name: str, cloud: str = "aws", region: str = "us-east-1"):
+    EMBEDDING_MODEL = "text-embedding-3-small"
+    EMBEDDING_DIMENSION = 1536
+
+    def __init__(self, api_key: str, index_name: str, cloud: str = "aws", region: str = "us-east-1",
+                 openai_client: Optional[AsyncOpenAI] = None, embed_batch_size: int = 128,
+                 upsert_batch_size: int = 100):
         self.pc = Pinecone(api_key=api_key)
         self.index_name = index_name
         self.cloud = cloud
         self.region = region
+        self.embed_batch_size = embed_batch_size
+        self.upsert_batch_size = upsert_batch_size
+        self.pdf_processor = PdfBatchProcessor()
         self.index = self._get_or_create_index()
-        self.openai_client = None
+        self.openai_client = openai_client
 
     def _get_or_create_index(self):
         """Get or create Pinecone index"""
         try:
             if not self.pc.has_index(self.index_name):
                 logger.info(f"Creating index: {self.index_name}")
-                self.pc.create_index_for_model(
+                self.pc.create_index(
                     name=self.index_name,
-                    cloud=self.cloud,
-                    region=self.region,
-                    embed={
-                        "model": "llama-text-embed-v2",
-                        "field_map": {"text": "chunk_text"}
-                    }
+                    dimension=self.EMBEDDING_DIMENSION,
+                    metric="cosine",
+                    spec=ServerlessSpec(cloud=self.cloud, region=self.region)
                 )
+            else:
+                # An existing index is never recreated; fail fast instead of every upsert failing later
+                dimension = self.pc.describe_index(self.index_name).dimension
+                if dimension != self.EMBEDDING_DIMENSION:
+                    raise ValueError(
+                        f"Pinecone index '{self.index_name}' has dimension {dimension}, but "
+                        f"{self.EMBEDDING_MODEL} embeddings need {self.EMBEDDING_DIMENSION}. "
+                        f"Set PINECONE_INDEX_NAME to a new index name and it will be created."
+                    )
             return self.pc.Index(self.index_name)
         except Exception as e:
             logger.error(f"Error with Pinecone index: {e}")
             raise
 
+    async def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with OpenAI, one request per batch"""
+        embeddings = []
+        for start in range(0, len(texts), self.embed_batch_size):
+            response = await call_with_retry(
+                self.openai_client.embeddings.create,
+                model=self.EMBEDDING_MODEL,
+                input=texts[start:start + self.embed_batch_size]
+            )
+            embeddings.extend(item.embedding for item in response.data)
+        return embeddings
+
     def extract_text_from_pdf(self, file_path: str) -> str:
         """Extract text from PDF file"""
         try:
-            text = ""
+            return self.pdf_processor.extract_text(file_path)
+        except Exception as e:
+            logger.warning(f"PyMuPDF could not read PDF, falling back to pypdf: {e}")
+
+        try:
             with open(file_path, 'rb') as file:
                 pdf_reader = PdfReader(file)
-                for page in pdf_reader.pages:
-                    text += page.extract_text()
-            return text
+                return "\n".join(page.extract_text() for page in pdf_reader.pages)
         except Exception as e:
             logger.error(f"Error extracting text from PDF: {e}")
             return ""
@@ -147,13 +283,13 @@ class PineconeRAG:
                 chunks.append(chunk.strip())
         return chunks
 
-    def upsert_document(self, file_path: str, document_id: str):
+    async def upsert_document(self, file_path: str, document_id: str):
         """Upload and index a PDF document"""
         try:
             logger.info(f"Processing document: {file_path}")
 
-            # Extract text
-            text = self.extract_text_from_pdf(file_path)
+            # Extract text (CPU-bound, keep it off the event loop)
+            text = await asyncio.to_thread(self.extract_text_from_pdf, file_path)
             if not text:
                 raise ValueError("Could not extract text from PDF")
 
@@ -161,18 +297,21 @@ class PineconeRAG:
             chunks = self.chunk_text(text, chunk_size=1000, overlap=200)
             logger.info(f"Created {len(chunks)} chunks")
 
-            # For now, we'll store chunks metadata
-            # In production, you'd use the embed model from Pinecone to create vectors
-            # and upsert them to the index
+            # Embed chunks once at ingest time
+            embeddings = await self.embed_texts(chunks)
+
+            # Upsert vectors with the chunk text as metadata
+            vectors = [
+                (f"{document_id}-{i}", embedding, {"text": chunk, "document_id": document_id})
+                for i, (chunk, embedding) in enumerate(zip(chunks, embeddings))
+            ]
+            # Vectors left from an earlier, longer version of this document would otherwise linger
+            await self._delete_document_vectors(document_id)
 
-            # Store metadata for retrieval
-            self.document_metadata = {
-                'document_id': document_id,
-                'file_path': file_path,
-                'chunks': chunks,
-                'uploaded_at': datetime.now().isoformat(),
-                'total_chunks': len(chunks)
-            }
+            for start in range(0, len(vectors), self.upsert_batch_size):
+                await asyncio.to_thread(
+                    self.index.upsert, vectors=vectors[start:start + self.upsert_batch_size]
+                )
 
             logger.info(f"Document {document_id} uploaded successfully")
             return True
@@ -181,32 +320,38 @@ class PineconeRAG:
             logger.error(f"Error upserting document: {e}")
             return False
 
-    def retrieve_context(self, query: str, top_k: int = 3) -> str:
+    def _list_document_vector_ids(self, document_id: str) -> List[str]:
+        """IDs of all chunks stored for a document"""
+        # The prefix also matches e.g. "report-2-0" for "report"; the chunk index never contains '-'
+        return [
+            vector_id
+            for page in self.index.list(prefix=f"{document_id}-")
+            for vector_id in page
+            if vector_id.rsplit("-", 1)[0] == document_id
+        ]
+
+    async def _delete_document_vectors(self, document_id: str):
+        """Delete every chunk previously stored for a document"""
+        ids = await asyncio.to_thread(self._list_document_vector_ids, document_id)
+        for start in range(0, len(ids), self.upsert_batch_size):
+            await asyncio.to_thread(self.index.delete, ids=ids[start:start + self.upsert_batch_size])
+        if ids:
+            logger.info(f"Deleted {len(ids)} existing vectors for document {document_id}")
+
+    async def retrieve_context(self, query: str, top_k: int = 3,
+                               query_vector: Optional[List[float]] = None) -> str:
         """Retrieve relevant context from documents"""
         try:
-            if not hasattr(self, 'document_metadata') or not self.document_metadata:
-                return ""
-
-            chunks = self.document_metadata.get('chunks', [])
-            if not chunks:
-                return ""
-
-            # Simple relevance scoring based on keyword matching
-            query_words = set(query.lower().split())
-            scored_chunks = []
-
-            for i, chunk in enumerate(chunks):
-                chunk_words = set(chunk.lower().split())
-                overlap = len(query_words & chunk_words)
-                if overlap > 0:
-                    scored_chunks.append((i, overlap, chunk))
-
-            # Sort by relevance
-            scored_chunks.sort(key=lambda x: x[1], reverse=True)
+            if query_vector is None:
+                query_vector = (await self.embed_texts([query]))[0]
+            results = await asyncio.to_thread(
+                self.index.query, vector=query_vector, top_k=top_k, include_metadata=True
+            )
 
-            # Return top k chunks
-            context = "\n\n---\n\n".join([chunk for _, _, chunk in scored_chunks[:top_k]])
-            return context if context else ""
+            context = "\n\n---\n\n".join(
+                match.metadata["text"] for match in results.matches if match.metadata
+            )
+            return context
 
         except Exception as e:
             logger.error(f"Error retrieving context: {e}")
@@ -216,21 +361,40 @@ class PineconeRAG:
 class AdvancedChatbot:
     """Advanced AI Chatbot with LangChain, Memory, and RAG"""
 
+    # Messages of conversation history included in each prompt
+    HISTORY_MESSAGES = 5
+
     def __init__(self, openai_api_key: str, pinecone_api_key: str, pinecone_index_name: str):
         self.openai_api_key = openai_api_key
+        # One pooled HTTP/2 client shared by every OpenAI call
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=2000, max_keepalive_connections=1000),
+            timeout=httpx.Timeout(120.0),
+            http2=True
+        )
         self.llm = ChatOpenAI(
             api_key=openai_api_key,
             model="gpt-4.1-mini",
-            temperature=0.7
+            temperature=0.7,
+            max_retries=0,
+            http_async_client=self.http_client
         )
-        self.openai_client = OpenAI(api_key=openai_api_key)
+        self.openai_client = AsyncOpenAI(api_key=openai_api_key, http_client=self.http_client, max_retries=0)
         self.memory = AdvancedMemorySystem()
+        self.cache = SemanticCache(dimension=PineconeRAG.EMBEDDING_DIMENSION)
         self.input_normalizer = InputNormalizer(self.openai_client)
         self.rag = PineconeRAG(
             api_key=pinecone_api_key,
-            index_name=pinecone_index_name
+            index_name=pinecone_index_name,
+            openai_client=self.openai_client
         )
-        self.system_prompt = self._build_system_prompt()
+        # Compile the prompt template and chain once; each turn only supplies the variables
+        self._chain = ChatPromptTemplate.from_messages([
+            ("system", self._build_system_prompt() + "{ctx}"),
+            ("human", "{input}")
+        ]) | self.llm
+        self._time_second = None
+        self._time_str = ""
 
     def _build_system_prompt(self) -> str:
         """Build system prompt for the chatbot"""
@@ -245,56 +409,88 @@ class AdvancedChatbot:
 Current time: {current_time}
 """
 
-    def normalize_and_process_input(self, user_input: str) -> str:
+    def _current_time(self) -> str:
+        """Current time at second granularity, formatted once per second"""
+        now = int(time.time())
+        if now != self._time_second:
+            self._time_second = now
+            self._time_str = datetime.fromtimestamp(now).isoformat()
+        return self._time_str
+
+    async def normalize_and_process_input(self, user_input: str) -> str:
         """Normalize and process user input"""
         logger.info(f"Original input: {user_input}")
-        normalized = self.input_normalizer.normalize(user_input)
+        normalized = await self.input_normalizer.normalize(user_input)
         logger.info(f"Normalized input: {normalized}")
         return normalized
 
-    def get_response(self, user_input: str, use_rag: bool = True) -> str:
-        """Get chatbot response"""
+    async def _prepare_turn(self, user_input: str, use_rag: bool) -> Tuple[str, Optional[List[float]], str, str]:
+        """Normalize input, record it in memory and fetch the query embedding, RAG context and cache context"""
+        # Normalize input
+        normalized_input = await self.normalize_and_process_input(user_input)
+
+        # The prompt carries the prior turns, so they are part of the cache context
+        prior_history = self.memory.get_formatted_history(max_messages=self.HISTORY_MESSAGES - 1)
+
+        # Add to memory
+        self.memory.add_message('user', normalized_input)
+
+        # Embed once; the vector serves both the cache lookup and the Pinecone query
         try:
-            # Normalize input
-            normalized_input = self.normalize_and_process_input(user_input)
+            query_vector = (await self.rag.embed_texts([normalized_input]))[0]
+        except Exception as e:
+            logger.warning(f"Error embedding query: {e}")
+            query_vector = None
 
-            # Add to memory
-            self.memory.add_message('user', normalized_input)
-
-            # Build context
-            context_parts = []
-
-            # Add conversation history
-            history = self.memory.get_formatted_history(max_messages=5)
-            if history:
-                context_parts.append(f"Recent conversation:\n{history}")
-
-            # Add RAG context if enabled
-            rag_context = None
-            if use_rag:
-                rag_context = self.rag.retrieve_context(normalized_input)
-                if rag_context:
-                    context_parts.append(f"Document context:\n{rag_context}")
-
-            # Build full prompt
-            full_prompt = self.system_prompt.format(
-                current_time=datetime.now().isoformat()
+        rag_context = ""
+        if use_rag and query_vector is not None:
+            rag_context = await self.rag.retrieve_context(normalized_input, query_vector=query_vector)
+
+        context_hash = hashlib.sha256(f"{prior_history}\0{rag_context}".encode()).hexdigest()
+        return normalized_input, query_vector, rag_context, context_hash
+
+    def _build_chain_input(self, normalized_input: str, rag_context: str) -> Dict[str, str]:
+        """Build the prompt variables from history and document context"""
+        parts = []
+
+        # Add conversation history
+        history = self.memory.get_formatted_history(max_messages=self.HISTORY_MESSAGES)
+        if history:
+            parts.append(f"Recent conversation:\n{history}")
+
+        # Add RAG context if available
+        if rag_context:
+            parts.append(f"Document context:\n{rag_context}")
+
+        return {
+            "current_time": self._current_time(),
+            "ctx": "".join(f"\n\n{part}" for part in parts),
+            "input": normalized_input
+        }
+
+    async def aget_response(self, user_input: str, use_rag: bool = True) -> str:
+        """Get chatbot response"""
+        try:
+            normalized_input, query_vector, rag_context, context_hash = await self._prepare_turn(
+                user_input, use_rag
             )
 
-            if context_parts:
-                full_prompt += "\n\n" + "\n\n".join(context_parts)
+            # Serve repeated or near-identical questions from the cache
+            if query_vector is not None:
+                cached = self.cache.lookup(query_vector, context_hash)
+                if cached is not None:
+                    self.memory.add_message('assistant', cached)
+                    return cached
 
             # Get response from LLM
-            messages = [
-                SystemMessage(content=full_prompt),
-                HumanMessage(content=normalized_input)
-            ]
-
-            response = self.llm.invoke(messages)
+            chain_input = self._build_chain_input(normalized_input, rag_context)
+            response = await call_with_retry(self._chain.ainvoke, chain_input)
             assistant_response = response.content
 
             # Add to memory
             self.memory.add_message('assistant', assistant_response)
+            if query_vector is not None:
+                self.cache.add(query_vector, assistant_response, context_hash)
 
             return assistant_response
 
@@ -302,13 +498,67 @@ Current time: {current_time}
             logger.error(f"Error getting response: {e}")
             return f"Sorry, I encountered an error: {str(e)}"
 
-    def upload_document(self, file_path: str, document_id: str) -> bool:
+    async def astream_response(self, user_input: str, use_rag: bool = True) -> AsyncIterator[str]:
+        """Stream chatbot response token by token"""
+        try:
+            normalized_input, query_vector, rag_context, context_hash = await self._prepare_turn(
+                user_input, use_rag
+            )
+
+            # A cache hit is sent as a single chunk
+            if query_vector is not None:
+                cached = self.cache.lookup(query_vector, context_hash)
+                if cached is not None:
+                    self.memory.add_message('assistant', cached)
+                    yield cached
+                    return
+
+            chain_input = self._build_chain_input(normalized_input, rag_context)
+            parts = []
+            for attempt in range(LLM_MAX_RETRIES):
+                try:
+                    async with _LLM_SEM:
+                        async for chunk in self._chain.astream(chain_input):
+                            if chunk.content:
+                                parts.append(chunk.content)
+                                yield chunk.content
+                    break
+                except _RETRYABLE_ERRORS as e:
+                    # A stream can only be retried before anything has been sent
+                    if parts or attempt == LLM_MAX_RETRIES - 1:
+                        raise
+                    await _backoff(attempt, e)
+
+            # Add the complete response to memory
+            assistant_response = "".join(parts)
+            self.memory.add_message('assistant', assistant_response)
+            if query_vector is not None:
+                self.cache.add(query_vector, assistant_response, context_hash)
+
+        except Exception as e:
+            logger.error(f"Error streaming response: {e}")
+            yield f"Sorry, I encountered an error: {str(e)}"
+
+    async def upload_document(self, file_path: str, document_id: str) -> bool:
         """Upload a document for RAG"""
-        return self.rag.upsert_document(file_path, document_id)
+        return await self.rag.upsert_document(file_path, document_id)
+
+    async def warmup(self, connections: int = 8):
+        """Open pooled connections to OpenAI before the first real request"""
+        await asyncio.gather(
+            *(self.openai_client.models.list() for _ in range(connections)),
+            return_exceptions=True
+        )
+
+    async def aclose(self):
+        """Close the shared HTTP client and PDF worker pool"""
+        await self.http_client.aclose()
+        self.rag.pdf_processor.shutdown()
 
     def reset_chat(self):
         """Reset chat session"""
         self.memory.clear()
+        self.cache.clear()
         logger.info("Chat session reset")
 
     def get_conversation_history(self) -> List[Dict]:
@@ -4,7 +4,7 @@ from typing import Optional
 class Settings(BaseSettings):
     openai_api_key: str
     pinecone_api_key: str
-    pinecone_index_name: str = "developer-quickstart-py"
+    pinecone_index_name: str = "chatbot-rag"
     pinecone_cloud: str = "aws"
     pinecone_region: str = "us-east-1"
     fastapi_host: str = "0.0.0.0"
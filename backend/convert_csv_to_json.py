@@ -3,8 +3,8 @@
 Convert sentiment CSV data to JSON training data
 Maps sentiment labels: 'pos' -> 1, 'neg' -> -1, 'neu' -> 0
 """
-import csv
-import json
+import orjson
+import pandas as pd
 from pathlib import Path
 
 def convert_csv_to_json(csv_path: str, json_path: str) -> dict:
@@ -16,47 +16,36 @@ def convert_csv_to_json(csv_path: str, json_path: str) -> dict:
         'neu': 0
     }
 
-    training_data = []
-    skipped = 0
-
     try:
-        with open(csv_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-
-            for idx, row in enumerate(reader, start=2):  # start at 2 because of header
-                try:
-                    text = row.get('Text', '').strip()
-                    sentiment_str = row.get('Sentiment', '').strip().lower()
+        df = pd.read_csv(csv_path, usecols=['Text', 'Sentiment'], dtype='string', encoding='utf-8')
 
-                    if not text or not sentiment_str:
-                        skipped += 1
-                        continue
+        text = df['Text'].str.strip()
+        sentiment = df['Sentiment'].str.strip().str.lower()
+        labels = sentiment.map(sentiment_map)
 
-                    sentiment_label = sentiment_map.get(sentiment_str)
-                    if sentiment_label is None:
-                        print(f"Warning: Unknown sentiment '{sentiment_str}' at row {idx}, skipping")
-                        skipped += 1
-                        continue
+        missing = text.isna() | (text == '') | sentiment.isna() | (sentiment == '')
+        unknown = ~missing & labels.isna()
+        if unknown.any():
+            unknown_values = ', '.join(sentiment[unknown].unique()[:5])
+            print(f"Warning: Skipping {int(unknown.sum())} rows with unknown sentiment ({unknown_values})")
 
-                    training_data.append({
-                        'text': text,
-                        'label': sentiment_label
-                    })
-                except Exception as e:
-                    print(f"Error processing row {idx}: {e}")
-                    skipped += 1
-                    continue
+        valid = ~(missing | unknown)
+        training_data = pd.DataFrame({
+            'text': text[valid],
+            'label': labels[valid].astype(int)
+        })
 
         # Write to JSON
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(training_data, f, ensure_ascii=False, indent=2)
+        with open(json_path, 'wb') as f:
+            f.write(orjson.dumps(training_data.to_dict('records'), option=orjson.OPT_INDENT_2))
 
+        counts = training_data['label'].value_counts()
         stats = {
             'total': len(training_data),
-            'positive': sum(1 for d in training_data if d['label'] == 1),
-            'negative': sum(1 for d in training_data if d['label'] == -1),
-            'neutral': sum(1 for d in training_data if d['label'] == 0),
-            'skipped': skipped
+            'positive': int(counts.get(1, 0)),
+            'negative': int(counts.get(-1, 0)),
+            'neutral': int(counts.get(0, 0)),
+            'skipped': int(len(df) - len(training_data))
         }
 
         print(f"✓ Conversion complete!")
@@ -1,15 +1,20 @@
-from fastapi import FastAPI, HTTPException, File, UploadFile
+from fastapi import FastAPI, HTTPException, File, UploadFile, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict
 from contextlib import asynccontextmanager
+import asyncio
+import time
+from collections import OrderedDict
+import aiohttp
 import logging
 import os
 from pathlib import Path
-import tempfile
+import aiofiles.tempfile
 
 from config import settings
-from scrapers import scrape_yellow_pages
+from scrapers import ScrapedItem, scrape_yellow_pages
 from sentiment_analyzer import SentimentAnalyzer
 from chatbot import AdvancedChatbot
 
@@ -21,10 +26,43 @@ logger = logging.getLogger(__name__)
 logging.getLogger("langchain.pydantic_v1").setLevel(logging.ERROR)
 logging.getLogger("pydantic.v1").setLevel(logging.ERROR)
 
+# Uploads are streamed to disk in fixed-size chunks, on RAM-backed storage when available
+UPLOAD_CHUNK_SIZE = 1 << 20
+UPLOAD_TMP_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+# Concurrent scrape requests allowed at once; extra requests wait for a slot
+SCRAPE_MAX_CONCURRENCY = 16
+
 # Initialize services
 sentiment_analyzer = None
 chatbot = None
 
+# Document indexing status: processing / completed / failed
+# Finished entries stay pollable for a while, then are evicted oldest first
+UPLOAD_STATUS_TTL = 3600
+UPLOAD_STATUS_MAX_FINISHED = 1000
+upload_status: Dict[str, str] = {}
+_upload_finished_at: "OrderedDict[str, float]" = OrderedDict()
+
+
+def _evict_finished_uploads():
+    cutoff = time.monotonic() - UPLOAD_STATUS_TTL
+    while _upload_finished_at:
+        document_id, finished_at = next(iter(_upload_finished_at.items()))
+        if finished_at > cutoff and len(_upload_finished_at) <= UPLOAD_STATUS_MAX_FINISHED:
+            break
+        del _upload_finished_at[document_id]
+        upload_status.pop(document_id, None)
+
+
+def set_upload_status(document_id: str, status: str):
+    """Record a document's indexing status"""
+    upload_status[document_id] = status
+    _upload_finished_at.pop(document_id, None)
+    if status != "processing":
+        _upload_finished_at[document_id] = time.monotonic()
+    _evict_finished_uploads()
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -33,12 +71,20 @@ async def lifespan(app: FastAPI):
 
     logger.info("Initializing services...")
 
+    # Shared outbound HTTP session and scrape limiter
+    app.state.http_session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=64, limit_per_host=8)
+    )
+    app.state.scrape_sem = asyncio.Semaphore(SCRAPE_MAX_CONCURRENCY)
+
     # Initialize Sentiment Analyzer (with auto-training enabled)
     try:
         sentiment_analyzer = SentimentAnalyzer(
             openai_api_key=settings.openai_api_key,
             auto_train=True
         )
+        if sentiment_analyzer.batcher:
+            await sentiment_analyzer.batcher.start()
         logger.info("✓ Sentiment Analyzer initialized")
     except Exception as e:
         logger.warning(f"Sentiment Analyzer initialization warning: {e}")
@@ -50,6 +96,7 @@ async def lifespan(app: FastAPI):
             pinecone_api_key=settings.pinecone_api_key,
             pinecone_index_name=settings.pinecone_index_name
         )
+        await chatbot.warmup()
         logger.info("✓ Chatbot initialized")
     except Exception as e:
         logger.warning(f"Chatbot initialization warning: {e}")
@@ -58,6 +105,16 @@ async def lifespan(app: FastAPI):
 
     logger.info("Shutting down services...")
 
+    await app.state.http_session.close()
+
+    if sentiment_analyzer:
+        if sentiment_analyzer.batcher:
+            await sentiment_analyzer.batcher.stop()
+        await sentiment_analyzer.aclose()
+
+    if chatbot:
+        await chatbot.aclose()
+
 
 # Initialize FastAPI app with lifespan
 app = FastAPI(
@@ -87,7 +144,7 @@ class ScrapeRequest(BaseModel):
 class ScrapeResponse(BaseModel):
     query: str
     items_count: int
-    items: List[Dict]
+    items: List[ScrapedItem]
 
 
 @app.post("/api/scrape/yellow-pages", response_model=ScrapeResponse)
@@ -98,7 +155,12 @@ async def scrape_yellow_pages_endpoint(request: ScrapeRequest):
     """
     try:
         logger.info(f"Scraping Yellow Pages for: {request.query} (max {request.max_pages} pages)")
-        items = scrape_yellow_pages(request.query, max_pages=request.max_pages)
+        async with app.state.scrape_sem:
+            items = await scrape_yellow_pages(
+                request.query,
+                max_pages=request.max_pages,
+                session=app.state.http_session
+            )
 
         return ScrapeResponse(
             query=request.query,
@@ -141,13 +203,38 @@ async def analyze_sentiment(request: SentimentRequest):
         if not sentiment_analyzer:
             raise HTTPException(status_code=503, detail="Sentiment Analyzer not initialized")
 
-        result = sentiment_analyzer.analyze(request.text)
+        result = await sentiment_analyzer.analyze(request.text)
         return SentimentResponse(**result)
     except Exception as e:
         logger.error(f"Error analyzing sentiment: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+class SentimentBatchRequest(BaseModel):
+    texts: List[str]
+
+
+class SentimentBatchResponse(BaseModel):
+    results: List[SentimentResponse]
+
+
+@app.post("/api/sentiment/analyze-batch", response_model=SentimentBatchResponse)
+async def analyze_sentiment_batch(request: SentimentBatchRequest):
+    """
+    Analyze sentiment of several texts
+    OpenAI calls are micro-batched with other concurrent requests
+    """
+    try:
+        if not sentiment_analyzer:
+            raise HTTPException(status_code=503, detail="Sentiment Analyzer not initialized")
+
+        results = await sentiment_analyzer.analyze_batch(request.texts)
+        return SentimentBatchResponse(results=[SentimentResponse(**result) for result in results])
+    except Exception as e:
+        logger.error(f"Error analyzing sentiment batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 class SentimentTrainRequest(BaseModel):
     texts: List[str]
     labels: List[int]
@@ -163,13 +250,30 @@ async def train_sentiment_models(request: SentimentTrainRequest):
         if not sentiment_analyzer:
             raise HTTPException(status_code=503, detail="Sentiment Analyzer not initialized")
 
-        result = sentiment_analyzer.train_models(request.texts, request.labels)
+        result = await asyncio.to_thread(sentiment_analyzer.train_models, request.texts, request.labels)
         return result
     except Exception as e:
         logger.error(f"Error training models: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/sentiment/update")
+async def update_sentiment_models(request: SentimentTrainRequest):
+    """
+    Incrementally update trained models with new samples
+    labels: -1 (Negative), 0 (Neutral), 1 (Positive)
+    """
+    try:
+        if not sentiment_analyzer:
+            raise HTTPException(status_code=503, detail="Sentiment Analyzer not initialized")
+
+        result = await asyncio.to_thread(sentiment_analyzer.update_models, request.texts, request.labels)
+        return result
+    except Exception as e:
+        logger.error(f"Error updating models: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/api/sentiment/training-status")
 async def get_training_status():
     """Get ML models training status and metrics"""
@@ -204,7 +308,7 @@ async def chat_message(request: ChatRequest):
         if not chatbot:
             raise HTTPException(status_code=503, detail="Chatbot not initialized")
 
-        response = chatbot.get_response(request.message, use_rag=request.use_rag)
+        response = await chatbot.aget_response(request.message, use_rag=request.use_rag)
 
         return ChatResponse(
             message=request.message,
@@ -215,6 +319,40 @@ async def chat_message(request: ChatRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def format_sse(data: str, event: str = None) -> str:
+    """Format a Server-Sent Events message, one data line per text line"""
+    lines = [f"event: {event}"] if event else []
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Send a message to the chatbot and stream the response as Server-Sent Events
+    Each token arrives as a data event; an "end" event marks completion
+    """
+    try:
+        if not chatbot:
+            raise HTTPException(status_code=503, detail="Chatbot not initialized")
+
+        async def generate():
+            async for chunk in chatbot.astream_response(request.message, use_rag=request.use_rag):
+                yield format_sse(chunk)
+            yield format_sse("", event="end")
+
+        return StreamingResponse(
+            generate(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in chat stream: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/api/chat/history")
 async def get_chat_history():
     """Get chat history for current session"""
@@ -243,9 +381,28 @@ async def reset_chat():
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/api/chat/upload")
-async def upload_document(file: UploadFile = File(...)):
-    """Upload a PDF document for RAG"""
+async def process_document(file_path: str, document_id: str):
+    """Index an uploaded document in the background and record the outcome"""
+    try:
+        success = await chatbot.upload_document(file_path, document_id)
+        set_upload_status(document_id, "completed" if success else "failed")
+    except Exception as e:
+        logger.error(f"Error processing document {document_id}: {e}")
+        set_upload_status(document_id, "failed")
+    finally:
+        # Clean up temp file
+        try:
+            os.unlink(file_path)
+        except OSError:
+            pass
+
+
+@app.post("/api/chat/upload", status_code=202)
+async def upload_document(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+    """
+    Upload a PDF document for RAG
+    Indexing runs in the background; poll /api/chat/upload/{document_id}/status
+    """
     try:
         if not chatbot:
             raise HTTPException(status_code=503, detail="Chatbot not initialized")
@@ -254,29 +411,19 @@ async def upload_document(file: UploadFile = File(...)):
             raise HTTPException(status_code=400, detail="Only PDF files are allowed")
 
         # Save file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-            contents = await file.read()
-            tmp_file.write(contents)
-            tmp_file.flush()
-
-            # Upload to RAG
-            document_id = file.filename.replace(".pdf", "").replace(" ", "_")
-            success = chatbot.upload_document(tmp_file.name, document_id)
-
-            # Clean up temp file
-            try:
-                os.unlink(tmp_file.name)
-            except:
-                pass
-
-            if success:
-                return {
-                    "message": "Document uploaded successfully",
-                    "status": "success",
-                    "document_id": document_id
-                }
-            else:
-                raise HTTPException(status_code=500, detail="Failed to upload document")
+        async with aiofiles.tempfile.NamedTemporaryFile(delete=False, suffix=".pdf", dir=UPLOAD_TMP_DIR) as tmp_file:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                await tmp_file.write(chunk)
+
+        document_id = file.filename.replace(".pdf", "").replace(" ", "_")
+        set_upload_status(document_id, "processing")
+        background_tasks.add_task(process_document, tmp_file.name, document_id)
+
+        return {
+            "message": "Document accepted for processing",
+            "status": "processing",
+            "document_id": document_id
+        }
 
     except HTTPException:
         raise
@@ -285,6 +432,17 @@ async def upload_document(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/chat/upload/{document_id}/status")
+async def get_upload_status(document_id: str):
+    """Get processing status of an uploaded document"""
+    _evict_finished_uploads()
+    status = upload_status.get(document_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    return {"document_id": document_id, "status": status}
+
+
 # =============== HEALTH CHECK ===============
 
 @app.get("/health")
@@ -293,6 +451,7 @@ async def health_check():
     return {
         "status": "ok",
         "sentiment_analyzer": sentiment_analyzer is not None,
+        "openai_cache": await asyncio.to_thread(sentiment_analyzer.cache_stats) if sentiment_analyzer else None,
         "chatbot": chatbot is not None
     }
 
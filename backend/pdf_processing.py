@@ -0,0 +1,54 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import pymupdf
+
+# Kept free of the chatbot's heavy imports: spawn workers re-import this module
+
+
+def _extract_page_range(file_path: str, start: int, stop: int) -> str:
+    """Extract text from pages [start, stop) of a PDF (runs in a worker process)"""
+    with pymupdf.open(file_path) as doc:
+        return "\n".join(doc[i].get_text("text") for i in range(start, stop))
+
+
+class PdfBatchProcessor:
+    """Parallel PDF text extraction sharing one process pool across files"""
+
+    def __init__(self, max_workers: Optional[int] = None, min_parallel_pages: int = 8):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.min_parallel_pages = min_parallel_pages
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process that runs an event loop and threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def extract_text(self, file_path: str) -> str:
+        """Extract text, splitting large documents into page ranges across workers"""
+        with pymupdf.open(file_path) as doc:
+            page_count = doc.page_count
+            # Short documents aren't worth the inter-process overhead
+            if page_count < self.min_parallel_pages or self.max_workers == 1:
+                return "\n".join(page.get_text("text") for page in doc)
+
+        executor = self._get_executor()
+        step = -(-page_count // self.max_workers)
+        futures = [
+            executor.submit(_extract_page_range, file_path, start, min(start + step, page_count))
+            for start in range(0, page_count, step)
+        ]
+        return "\n".join(future.result() for future in futures)
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
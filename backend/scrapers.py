@@ -1,18 +1,20 @@
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import re
+import aiohttp
+from lxml import etree, html as lxml_html
 from urllib.parse import urljoin, quote
-from typing import List, Dict, Optional
+from types import MappingProxyType
+from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 import logging
 import random
-import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ScrapedItem:
     name: str
     address: str
@@ -28,15 +30,62 @@ class YellowPagesScraper:
     BASE_URL = "https://www.yellowpages.co.th"
     SEARCH_URL = f"{BASE_URL}/ypsearch"
 
-    def __init__(self, max_retries: int = 3, timeout: int = 10):
+    # Sent on every request via the session; only the User-Agent varies per request
+    _BASE_HEADERS = MappingProxyType({
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.5',
+        'Referer': BASE_URL,
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1'
+    })
+
+    # Compiled once; evaluated in C with no per-node Python callbacks
+    _LISTING_XPATH = etree.XPath("//div[contains(@class, 'yp-search-listing')]")
+    _NAME_XPATH = etree.XPath("((.//h3)[1]//a)[1]")
+    _ADDRESS_XPATH = etree.XPath(
+        "(.//p[contains(concat(' ', normalize-space(@class), ' '), ' yp-listing-address ')])[1]"
+    )
+    _CATEGORY_XPATH = etree.XPath("(.//a[contains(@href, 'heading/')])[1]")
+    _MAP_XPATH = etree.XPath("(.//a[contains(translate(@href, 'MAP', 'map'), 'map')])[1]/@href")
+    _META_CHARSET = re.compile(rb'<meta[^>]+charset', re.IGNORECASE)
+
+    def __init__(self, max_retries: int = 3, timeout: int = 10, max_concurrency: int = 4,
+                 session: Optional[aiohttp.ClientSession] = None):
         self.max_retries = max_retries
         self.timeout = timeout
+        self.max_concurrency = max_concurrency
         self.user_agents = [
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         ]
         self.items: List[ScrapedItem] = []
+        # An externally provided session is shared with other callers and never closed here
+        self._session = session
+        self._owns_session = session is None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Get the persistent session, creating it on first use"""
+        if self._owns_session and (self._session is None or self._session.closed):
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=16, limit_per_host=8, ttl_dns_cache=300),
+                headers=self._BASE_HEADERS
+            )
+        return self._session
+
+    async def close(self):
+        """Close the persistent session"""
+        if not self._owns_session:
+            return
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
 
     def build_search_url(self, query: str, page: int = 1) -> str:
         """Build search URL from query string"""
@@ -46,129 +95,142 @@ class YellowPagesScraper:
         return f"{self.SEARCH_URL}?q={encoded_query}&page={page}"
 
     def _get_headers(self) -> Dict[str, str]:
-        """Get headers with random user agent"""
-        return {
-            'User-Agent': random.choice(self.user_agents),
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Referer': self.BASE_URL,
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1'
-        }
-
-    def scrape(self, query: str, max_pages: int = 1) -> List[ScrapedItem]:
-        """Scrape results for a given query"""
-        self.items = []
+        """Get per-request headers; the rest are set once on an owned session"""
+        headers = {'User-Agent': random.choice(self.user_agents)}
+        if not self._owns_session:
+            return {**self._BASE_HEADERS, **headers}
+        return headers
+
+    async def _fetch(self, semaphore: asyncio.Semaphore, url: str) -> Tuple[bytes, Optional[str]]:
+        """Fetch a page and its charset, throttled by the semaphore and retrying connection errors"""
+        session = self._get_session()
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    async with session.get(
+                        url,
+                        headers=self._get_headers(),
+                        timeout=aiohttp.ClientTimeout(total=self.timeout)
+                    ) as response:
+                        response.raise_for_status()
+                        content = await response.read()
+                        # Only the header charset is forced; otherwise libxml2 reads <meta charset>
+                        return content, response.charset
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    if attempt == self.max_retries:
+                        raise
+                    delay = 0.5 * (2 ** attempt)
+                    logger.warning(f"Error fetching {url} ({e}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+
+    def _find_listings(self, content: bytes, encoding: Optional[str]) -> list:
+        """Find all business listing containers in a results page"""
+        if encoding is None and not self._META_CHARSET.search(content):
+            # No charset anywhere: assume UTF-8 rather than libxml2's Latin-1 default
+            encoding = 'utf-8'
+        tree = lxml_html.fromstring(content, parser=lxml_html.HTMLParser(encoding=encoding))
+        return self._LISTING_XPATH(tree)
+
+    def _parse_listing(self, container, url: str) -> Optional[ScrapedItem]:
+        """Parse a single listing container, returning None if it has no name"""
+        # Extract name from h3 > a; the same anchor supplies the source URL
+        name_elems = self._NAME_XPATH(container)
+        if not name_elems:
+            # Only return items with valid names
+            return None
+        name_anchor = name_elems[0]
+        name = name_anchor.text_content().strip()
+
+        # Extract address from p.yp-listing-address
+        address = "N/A"
+        address_elems = self._ADDRESS_XPATH(container)
+        if address_elems:
+            address = address_elems[0].text_content().strip()
+
+        # Extract category from a[href*="heading/"]
+        category = "N/A"
+        category_elems = self._CATEGORY_XPATH(container)
+        if category_elems:
+            category = category_elems[0].text_content().strip()
+
+        # Extract map link - look for link with map reference
+        map_link = None
+        map_hrefs = self._MAP_XPATH(container)
+        if map_hrefs:
+            map_link = str(map_hrefs[0])
+
+        # Extract source URL - use the name link's href
+        source_url = url
+        profile_url = name_anchor.get('href')
+        if profile_url:
+            if profile_url.startswith('http'):
+                source_url = profile_url
+            else:
+                source_url = urljoin(self.BASE_URL, profile_url)
+
+        return ScrapedItem(
+            name=name,
+            address=address,
+            category=category,
+            map_link=map_link,
+            source_url=source_url,
+            scraped_at=datetime.now().isoformat()
+        )
+
+    async def scrape(self, query: str, max_pages: int = 1) -> List[ScrapedItem]:
+        """Scrape results for a given query, fetching all pages concurrently"""
+        items = []
 
         logger.info(f"Scraping Yellow Pages for: {query}")
 
-        for page in range(1, max_pages + 1):
-            url = self.build_search_url(query, page)
-            logger.info(f"Scraping page {page}: {url}")
+        urls = [self.build_search_url(query, page) for page in range(1, max_pages + 1)]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        pages = await asyncio.gather(
+            *(self._fetch(semaphore, url) for url in urls),
+            return_exceptions=True
+        )
+
+        # Pages are processed in order, stopping at the first failed or empty page
+        for page, (url, fetched) in enumerate(zip(urls, pages), start=1):
+            if isinstance(fetched, aiohttp.ClientError):
+                logger.error(f"Request error on page {page}: {fetched}")
+                break
+            if isinstance(fetched, Exception):
+                logger.error(f"Error during scraping on page {page}: {fetched}")
+                break
 
             try:
-                response = requests.get(url, headers=self._get_headers(), timeout=self.timeout)
-                response.raise_for_status()
-
-                soup = BeautifulSoup(response.content, 'lxml')
-
-                # Find all business listings using correct selector
-                listing_containers = soup.find_all('div', class_=lambda x: x and 'yp-search-listing' in x)
-
-                logger.info(f"Page {page}: Found {len(listing_containers)} listings")
-
-                if not listing_containers:
-                    logger.info(f"No more listings found on page {page}. Stopping pagination.")
-                    break
-
-                for container in listing_containers:
-                    try:
-                        # Extract name from h3 > a
-                        name = "N/A"
-                        name_link = container.find('h3')
-                        if name_link:
-                            name_elem = name_link.find('a')
-                            if name_elem:
-                                name = name_elem.get_text(strip=True)
-
-                        # Extract address from p.yp-listing-address
-                        address = "N/A"
-                        address_elem = container.find('p', class_='yp-listing-address')
-                        if address_elem:
-                            address = address_elem.get_text(strip=True)
-
-                        # Extract category from a[href*="heading/"]
-                        category = "N/A"
-                        category_elem = container.find('a', href=lambda x: x and 'heading/' in x)
-                        if category_elem:
-                            category = category_elem.get_text(strip=True)
-
-                        # Extract map link - look for link with map reference
-                        map_link = None
-                        all_links = container.find_all('a')
-                        for link in all_links:
-                            href = link.get('href', '')
-                            if 'map' in href.lower() or 'maps' in href.lower():
-                                map_link = href
-                                break
-
-                        # Extract source URL - use the name link's href
-                        source_url = url
-                        if name_link:
-                            name_elem = name_link.find('a')
-                            if name_elem and name_elem.get('href'):
-                                profile_url = name_elem.get('href')
-                                if profile_url.startswith('http'):
-                                    source_url = profile_url
-                                else:
-                                    source_url = urljoin(self.BASE_URL, profile_url)
-
-                        # Only add items with valid names
-                        if name != "N/A":
-                            item = ScrapedItem(
-                                name=name,
-                                address=address,
-                                category=category,
-                                map_link=map_link,
-                                source_url=source_url,
-                                scraped_at=datetime.now().isoformat()
-                            )
-                            self.items.append(item)
-
-                    except Exception as e:
-                        logger.warning(f"Error parsing item: {e}")
-                        continue
-
-                # Add delay between requests
-                if page < max_pages:
-                    delay = random.uniform(2, 4)
-                    logger.info(f"Waiting {delay:.1f} seconds before next page...")
-                    time.sleep(delay)
-
-            except requests.RequestException as e:
-                logger.error(f"Request error on page {page}: {e}")
-                break
+                listing_containers = self._find_listings(*fetched)
             except Exception as e:
                 logger.error(f"Error during scraping on page {page}: {e}")
                 break
 
-        logger.info(f"Successfully scraped {len(self.items)} items total")
-        return self.items
-
-
-def scrape_yellow_pages(query: str, max_pages: int = 1) -> List[Dict]:
-    """Main function to scrape yellow pages"""
-    scraper = YellowPagesScraper()
-    items = scraper.scrape(query, max_pages)
-
-    return [
-        {
-            'name': item.name,
-            'address': item.address,
-            'category': item.category,
-            'map_link': item.map_link,
-            'source_url': item.source_url,
-            'scraped_at': item.scraped_at
-        }
-        for item in items
-    ]
+            logger.info(f"Page {page}: Found {len(listing_containers)} listings")
+
+            if not listing_containers:
+                logger.info(f"No more listings found on page {page}. Stopping pagination.")
+                break
+
+            for container in listing_containers:
+                try:
+                    item = self._parse_listing(container, url)
+                    if item:
+                        items.append(item)
+                except Exception as e:
+                    logger.warning(f"Error parsing item: {e}")
+                    continue
+
+        logger.info(f"Successfully scraped {len(items)} items total")
+        self.items = items
+        return items
+
+
+async def scrape_yellow_pages(query: str, max_pages: int = 1,
+                              session: Optional[aiohttp.ClientSession] = None) -> List[ScrapedItem]:
+    """Main function to scrape yellow pages, optionally over a caller-owned session"""
+    if session is not None:
+        return await YellowPagesScraper(session=session).scrape(query, max_pages)
+
+    # Without a shared session, use a scraper-owned one that is closed on return
+    async with YellowPagesScraper() as scraper:
+        return await scraper.scrape(query, max_pages)
@@ -1,31 +1,208 @@
 import os
-from typing import Dict, Optional, List, Tuple
+import asyncio
+from typing import Dict, Optional, List, Tuple, Hashable, Any, Callable, Awaitable
 from datetime import datetime
+from collections import OrderedDict
+import hashlib
+import threading
+import copy
+from dataclasses import dataclass, replace
 import logging
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI
 import json
-import pickle
+import orjson
+import joblib
+import diskcache
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+from sklearn.pipeline import make_pipeline
 from sklearn.naive_bayes import MultinomialNB
-from sklearn.linear_model import LogisticRegression
+from sklearn.linear_model import SGDClassifier
+from sklearn.utils.class_weight import compute_class_weight
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, confusion_matrix
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+class LRUCache:
+    """Thread-safe in-memory LRU cache"""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def text_key(text: str) -> bytes:
+    """Cache key for a text: blake2b digest of its case- and whitespace-normalized form"""
+    normalized = " ".join(text.lower().split())
+    return hashlib.blake2b(normalized.encode(), digest_size=16).digest()
+
+
+@dataclass(frozen=True)
+class TrainedModels:
+    """Vectorizer and classifiers that are published and replaced together"""
+    vectorizer: Any
+    nb_model: MultinomialNB
+    lr_model: SGDClassifier
+    generation: int = 0
+
+
+def is_valid_result(result: Any) -> bool:
+    """Whether an OpenAI sentiment result has the fields the API and frontend rely on"""
+    return (
+        isinstance(result, dict)
+        and isinstance(result.get('sentiment'), str)
+        and isinstance(result.get('confidence'), (int, float))
+        and not isinstance(result.get('confidence'), bool)
+    )
+
+
+class OpenAISentimentBatcher:
+    """Micro-batch concurrent OpenAI sentiment requests into a single chat completion"""
+
+    SYSTEM_PROMPT = (
+        "You are a sentiment analysis expert. You will receive a JSON array of texts. "
+        "Analyze the sentiment of each text and respond with ONLY a JSON object with key 'results': "
+        "an array with one entry per text, in the same order, each containing 'sentiment' "
+        "(Positive, Negative, or Neutral) and 'confidence' (0.0 to 1.0) and 'explanation' "
+        "(brief explanation in Thai)"
+    )
+
+    def __init__(self, get_client: Callable[[], AsyncOpenAI], model: str,
+                 fallback: Callable[[str], Awaitable[Optional[Dict]]],
+                 max_batch_size: int = 16, max_wait: float = 0.05):
+        self.get_client = get_client
+        # Per-text request used when a batched reply can't be matched up with its inputs
+        self.fallback = fallback
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._pending: set = set()
+
+    async def start(self):
+        """Start the background batching loop"""
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the batching loop and wait for in-flight batches"""
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, *self._pending, return_exceptions=True)
+            self._worker = None
+
+    async def analyze(self, text: str) -> Optional[Dict]:
+        """Queue a text and wait for its slot in the next batch"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Run batches concurrently so a slow completion doesn't hold up the next window
+            task = asyncio.create_task(self._process(batch))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    async def _process(self, batch: List[Tuple[str, asyncio.Future]]):
+        texts = [text for text, _ in batch]
+        results: List[Optional[Dict]] = [None] * len(batch)
+        try:
+            response = await self.get_client().chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": self.SYSTEM_PROMPT},
+                    {"role": "user", "content": orjson.dumps(texts).decode()}
+                ],
+                response_format={"type": "json_object"},
+                temperature=0.3,
+                max_tokens=200 * len(batch)
+            )
+            parsed = orjson.loads(response.choices[0].message.content).get('results')
+            if isinstance(parsed, list) and len(parsed) == len(batch):
+                results = [result if is_valid_result(result) else None for result in parsed]
+            else:
+                count = len(parsed) if isinstance(parsed, list) else 0
+                logger.warning(f"OpenAI batch returned {count} results for {len(batch)} texts, "
+                               f"falling back to single requests")
+                fallbacks = await asyncio.gather(*(self.fallback(t) for t in texts), return_exceptions=True)
+                results = [None if isinstance(result, BaseException) else result for result in fallbacks]
+        except Exception as e:
+            logger.error(f"Error in OpenAI batch analysis: {e}")
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
 class SentimentAnalyzer:
     """Sentiment Analysis using OpenAI API and ML Models (Naive Bayes, Logistic Regression)"""
 
-    def __init__(self, openai_api_key: str = None, auto_train: bool = True):
-        self.openai_client = OpenAI(api_key=openai_api_key) if openai_api_key else None
+    OPENAI_MODEL = "gpt-4o-mini"
+    LABEL_MAP = {-1: 0, 0: 1, 1: 2}  # Negative, Neutral, Positive
+    CLASSES = np.array([0, 1, 2])
+
+    OPENAI_CACHE_TTL = 7 * 86400
+
+    def __init__(self, openai_api_key: str = None, auto_train: bool = True, cache_size: int = 1024,
+                 openai_cache_dir: str = './.cache/openai'):
+        # The OpenAI client and its connection pool are created on first use
+        self.openai_api_key = openai_api_key
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._openai_client: Optional[AsyncOpenAI] = None
+        self.batcher = OpenAISentimentBatcher(
+            self._get_openai_client, self.OPENAI_MODEL, self._request_openai
+        ) if openai_api_key else None
         self.class_labels = ['Negative', 'Neutral', 'Positive']
 
-        # ML Models
-        self.vectorizer = None
-        self.nb_model = None
-        self.lr_model = None
+        # Repeated texts skip inference; the ML cache is cleared whenever models are retrained
+        self._ml_cache = LRUCache(cache_size)
+        self._openai_cache = LRUCache(cache_size)
+
+        # OpenAI results also persist on disk so they survive restarts
+        self._openai_disk_cache = diskcache.Cache(openai_cache_dir)
+        self._openai_cache_hits = 0
+        self._openai_cache_misses = 0
+
+        # ML Models, swapped in as a unit by train/update so readers never mix old and new
+        self.models: Optional[TrainedModels] = None
+        self._train_lock = threading.Lock()
         self.training_history = {
             'trained': False,
             'samples': 0,
@@ -35,8 +212,8 @@ class SentimentAnalyzer:
             'cm_lr': None
         }
 
-        if self.openai_client:
-            logger.info("✓ OpenAI client initialized")
+        if self.openai_api_key:
+            logger.info("✓ OpenAI API key configured")
         else:
             logger.warning("⚠️ OpenAI API key not provided")
 
@@ -47,39 +224,111 @@ class SentimentAnalyzer:
         if auto_train and not self.training_history['trained']:
             self._auto_train_models()
 
-    def analyze_with_openai(self, text: str) -> Optional[Dict]:
+    def _openai_cache_key(self, text: str) -> str:
+        return f"{self.OPENAI_MODEL}|{text_key(text).hex()}"
+
+    async def _get_cached_openai(self, text: str) -> Optional[Dict]:
+        """Look up a previous OpenAI result in memory, then on disk"""
+        cache_key = self._openai_cache_key(text)
+        result = self._openai_cache.get(cache_key)
+        if result is None:
+            # diskcache is synchronous SQLite; keep it off the event loop
+            result = await asyncio.to_thread(self._openai_disk_cache.get, cache_key)
+            # Entries written before results were validated may be malformed
+            if not is_valid_result(result):
+                result = None
+            if result is not None:
+                self._openai_cache.set(cache_key, result)
+
+        if result is None:
+            self._openai_cache_misses += 1
+        else:
+            self._openai_cache_hits += 1
+        return result
+
+    async def _set_cached_openai(self, text: str, result: Dict):
+        cache_key = self._openai_cache_key(text)
+        self._openai_cache.set(cache_key, result)
+        await asyncio.to_thread(
+            self._openai_disk_cache.set, cache_key, result, expire=self.OPENAI_CACHE_TTL
+        )
+
+    def cache_stats(self) -> Dict:
+        """Hit rate of the OpenAI result cache (reads the disk cache; call off the event loop)"""
+        total = self._openai_cache_hits + self._openai_cache_misses
+        return {
+            'hits': self._openai_cache_hits,
+            'misses': self._openai_cache_misses,
+            'hit_rate': self._openai_cache_hits / total if total else 0.0,
+            'disk_entries': len(self._openai_disk_cache)
+        }
+
+    def _get_openai_client(self) -> AsyncOpenAI:
+        """Get the shared OpenAI client, creating it on first use"""
+        if self._openai_client is None:
+            self._http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=50),
+                http2=True
+            )
+            self._openai_client = AsyncOpenAI(api_key=self.openai_api_key, http_client=self._http_client)
+        return self._openai_client
+
+    async def aclose(self):
+        """Close the OpenAI connection pool and the persistent OpenAI cache"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+            self._openai_client = None
+        self._openai_disk_cache.close()
+
+    async def _request_openai(self, text: str) -> Optional[Dict]:
+        """Ask OpenAI for one text's sentiment; None if the reply is unusable"""
+        response = await self._get_openai_client().chat.completions.create(
+            model=self.OPENAI_MODEL,
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are a sentiment analysis expert. Analyze the sentiment of the given text and respond with ONLY a JSON object containing 'sentiment' (Positive, Negative, or Neutral) and 'confidence' (0.0 to 1.0) and 'explanation' (brief explanation in Thai)"
+                },
+                {
+                    "role": "user",
+                    "content": f"Analyze this text: {text}"
+                }
+            ],
+            response_format={"type": "json_object"},
+            temperature=0.3,
+            max_tokens=200
+        )
+
+        try:
+            result = orjson.loads(response.choices[0].message.content)
+        except orjson.JSONDecodeError:
+            # JSON mode still yields truncated output if max_tokens is hit
+            return None
+        return result if is_valid_result(result) else None
+
+    async def analyze_with_openai(self, text: str) -> Optional[Dict]:
         """Analyze sentiment using OpenAI GPT-4o-mini"""
         try:
-            if not self.openai_client:
+            if not self.openai_api_key:
                 logger.warning("OpenAI client not initialized")
                 return None
 
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a sentiment analysis expert. Analyze the sentiment of the given text and respond with ONLY a JSON object containing 'sentiment' (Positive, Negative, or Neutral) and 'confidence' (0.0 to 1.0) and 'explanation' (brief explanation in Thai)"
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Analyze this text: {text}"
-                    }
-                ],
-                temperature=0.3,
-                max_tokens=200
-            )
+            cached = await self._get_cached_openai(text)
+            if cached is not None:
+                return cached
 
-            try:
-                result = json.loads(response.choices[0].message.content)
-                return result
-            except json.JSONDecodeError:
+            result = await self._request_openai(text)
+            if result is None:
                 return {
                     "sentiment": "Neutral",
                     "confidence": 0.5,
                     "explanation": "Could not parse response"
                 }
 
+            await self._set_cached_openai(text, result)
+            return result
+
         except Exception as e:
             logger.error(f"Error in OpenAI analysis: {e}")
             return None
@@ -89,18 +338,18 @@ class SentimentAnalyzer:
         try:
             model_dir = os.path.join(os.getcwd(), 'ml_models')
             if os.path.exists(model_dir):
-                vectorizer_path = os.path.join(model_dir, 'vectorizer.pkl')
-                nb_path = os.path.join(model_dir, 'nb_model.pkl')
-                lr_path = os.path.join(model_dir, 'lr_model.pkl')
+                vectorizer_path = os.path.join(model_dir, 'vectorizer.joblib')
+                nb_path = os.path.join(model_dir, 'nb_model.joblib')
+                lr_path = os.path.join(model_dir, 'lr_model.joblib')
                 history_path = os.path.join(model_dir, 'training_history.json')
 
                 if all(os.path.exists(p) for p in [vectorizer_path, nb_path, lr_path]):
-                    with open(vectorizer_path, 'rb') as f:
-                        self.vectorizer = pickle.load(f)
-                    with open(nb_path, 'rb') as f:
-                        self.nb_model = pickle.load(f)
-                    with open(lr_path, 'rb') as f:
-                        self.lr_model = pickle.load(f)
+                    # Memory-map model arrays so forked workers share pages instead of copying them
+                    self.models = TrainedModels(
+                        vectorizer=joblib.load(vectorizer_path, mmap_mode='r'),
+                        nb_model=joblib.load(nb_path, mmap_mode='r'),
+                        lr_model=joblib.load(lr_path, mmap_mode='r')
+                    )
 
                     if os.path.exists(history_path):
                         with open(history_path, 'r') as f:
@@ -111,25 +360,34 @@ class SentimentAnalyzer:
         except Exception as e:
             logger.warning(f"Could not load pre-trained models: {e}")
 
-    def _save_models(self):
-        """Save trained models to disk"""
+    def _save_models(self, models: TrainedModels, training_history: Dict):
+        """Save trained models to disk (caller holds the training lock)"""
         try:
             model_dir = os.path.join(os.getcwd(), 'ml_models')
             os.makedirs(model_dir, exist_ok=True)
 
-            with open(os.path.join(model_dir, 'vectorizer.pkl'), 'wb') as f:
-                pickle.dump(self.vectorizer, f)
-            with open(os.path.join(model_dir, 'nb_model.pkl'), 'wb') as f:
-                pickle.dump(self.nb_model, f)
-            with open(os.path.join(model_dir, 'lr_model.pkl'), 'wb') as f:
-                pickle.dump(self.lr_model, f)
+            for name, model in [('vectorizer', models.vectorizer), ('nb_model', models.nb_model),
+                                ('lr_model', models.lr_model)]:
+                path = os.path.join(model_dir, f'{name}.joblib')
+                # Write to a new file and swap it in, so files already memory-mapped stay intact
+                joblib.dump(model, f'{path}.tmp', compress=0)
+                os.replace(f'{path}.tmp', path)
             with open(os.path.join(model_dir, 'training_history.json'), 'w') as f:
-                json.dump(self.training_history, f)
+                json.dump(training_history, f)
 
             logger.info("✓ Models saved successfully")
         except Exception as e:
             logger.error(f"Error saving models: {e}")
 
+    def _swap_models(self, models: TrainedModels, training_history: Dict):
+        """Publish newly built models; in-flight analyses finish on the ones they started with"""
+        self._save_models(models, training_history)
+        # ML cache entries are tagged with the generation that produced them
+        previous = self.models.generation if self.models else 0
+        self.models = replace(models, generation=previous + 1)
+        self.training_history = training_history
+        self._ml_cache.clear()
+
     def train_models(self, texts: List[str], labels: List[int]) -> Dict:
         """
         Train Naive Bayes and Logistic Regression models
@@ -138,76 +396,146 @@ class SentimentAnalyzer:
         if len(texts) < 10:
             return {'error': 'Need at least 10 samples to train'}
 
-        try:
-            # Convert labels to 0, 1, 2 format
-            label_map = {-1: 0, 0: 1, 1: 2}  # Negative, Neutral, Positive
-            converted_labels = np.array([label_map.get(l, 1) for l in labels])
-
-            # TF-IDF Vectorization
-            self.vectorizer = TfidfVectorizer(max_features=5000, ngram_range=(1, 2), min_df=2, max_df=0.8)
-            X = self.vectorizer.fit_transform(texts)
-
-            # Split data (80-20)
-            split_idx = int(len(texts) * 0.8)
-            X_train, X_test = X[:split_idx], X[split_idx:]
-            y_train, y_test = converted_labels[:split_idx], converted_labels[split_idx:]
-
-            # Train Naive Bayes
-            self.nb_model = MultinomialNB(alpha=0.5)
-            self.nb_model.fit(X_train, y_train)
-            y_pred_nb = self.nb_model.predict(X_test)
-
-            # Train Logistic Regression
-            self.lr_model = LogisticRegression(max_iter=1000, random_state=42, class_weight='balanced')
-            self.lr_model.fit(X_train, y_train)
-            y_pred_lr = self.lr_model.predict(X_test)
-
-            # Calculate metrics
-            self.training_history = {
-                'trained': True,
-                'samples': len(texts),
-                'nb_metrics': {
-                    'accuracy': float(accuracy_score(y_test, y_pred_nb)),
-                    'precision': float(precision_score(y_test, y_pred_nb, average='weighted', zero_division=0)),
-                    'recall': float(recall_score(y_test, y_pred_nb, average='weighted', zero_division=0)),
-                    'f1_score': float(f1_score(y_test, y_pred_nb, average='weighted', zero_division=0))
-                },
-                'lr_metrics': {
-                    'accuracy': float(accuracy_score(y_test, y_pred_lr)),
-                    'precision': float(precision_score(y_test, y_pred_lr, average='weighted', zero_division=0)),
-                    'recall': float(recall_score(y_test, y_pred_lr, average='weighted', zero_division=0)),
-                    'f1_score': float(f1_score(y_test, y_pred_lr, average='weighted', zero_division=0))
-                },
-                'cm_nb': confusion_matrix(y_test, y_pred_nb).tolist(),
-                'cm_lr': confusion_matrix(y_test, y_pred_lr).tolist()
-            }
+        # Train and update calls run one at a time
+        with self._train_lock:
+            try:
+                # Convert labels to 0, 1, 2 format
+                converted_labels = np.array([self.LABEL_MAP.get(l, 1) for l in labels])
+
+                # TF-IDF over hashed n-grams: no vocabulary dict to grow, store or pickle
+                vectorizer = make_pipeline(
+                    HashingVectorizer(n_features=2**18, ngram_range=(1, 2), alternate_sign=False, norm=None),
+                    TfidfTransformer()
+                )
+                X = vectorizer.fit_transform(texts)
+
+                # Split data (80-20)
+                split_idx = int(len(texts) * 0.8)
+                X_train, X_test = X[:split_idx], X[split_idx:]
+                y_train, y_test = converted_labels[:split_idx], converted_labels[split_idx:]
+
+                # Train Naive Bayes (2**18 hashed features: a larger alpha smooths everything to Neutral)
+                nb_model = MultinomialNB(alpha=0.02)
+                nb_model.fit(X_train, y_train)
+                y_pred_nb = nb_model.predict(X_test)
+
+                # Train Logistic Regression (log-loss SGD: one class per core, and supports partial_fit)
+                # Balanced weights are fixed as a dict here because partial_fit can't recompute them;
+                # classes missing from the training split keep weight 1.0
+                present = np.unique(y_train)
+                class_weight = {c: 1.0 for c in self.CLASSES.tolist()}
+                class_weight.update(zip(
+                    present.tolist(),
+                    compute_class_weight('balanced', classes=present, y=y_train)
+                ))
+                lr_model = SGDClassifier(loss='log_loss', class_weight=class_weight, n_jobs=-1, random_state=42)
+                lr_model.fit(X_train, y_train)
+                y_pred_lr = lr_model.predict(X_test)
+
+                # Calculate metrics
+                training_history = {
+                    'trained': True,
+                    'samples': len(texts),
+                    'nb_metrics': {
+                        'accuracy': float(accuracy_score(y_test, y_pred_nb)),
+                        'precision': float(precision_score(y_test, y_pred_nb, average='weighted', zero_division=0)),
+                        'recall': float(recall_score(y_test, y_pred_nb, average='weighted', zero_division=0)),
+                        'f1_score': float(f1_score(y_test, y_pred_nb, average='weighted', zero_division=0))
+                    },
+                    'lr_metrics': {
+                        'accuracy': float(accuracy_score(y_test, y_pred_lr)),
+                        'precision': float(precision_score(y_test, y_pred_lr, average='weighted', zero_division=0)),
+                        'recall': float(recall_score(y_test, y_pred_lr, average='weighted', zero_division=0)),
+                        'f1_score': float(f1_score(y_test, y_pred_lr, average='weighted', zero_division=0))
+                    },
+                    'cm_nb': confusion_matrix(y_test, y_pred_nb).tolist(),
+                    'cm_lr': confusion_matrix(y_test, y_pred_lr).tolist(),
+                    'classes': present.tolist()
+                }
 
-            self._save_models()
+                self._swap_models(TrainedModels(vectorizer, nb_model, lr_model), training_history)
 
-            logger.info("✓ Models trained successfully")
-            return self.training_history
+                logger.info("✓ Models trained successfully")
+                return training_history
 
-        except Exception as e:
-            logger.error(f"Error training models: {e}")
-            return {'error': str(e)}
+            except Exception as e:
+                logger.error(f"Error training models: {e}")
+                return {'error': str(e)}
+
+    def update_models(self, texts: List[str], labels: List[int]) -> Dict:
+        """
+        Incrementally update trained models with new labeled samples
+        labels: -1 (Negative), 0 (Neutral), 1 (Positive)
+        """
+        if not texts or len(texts) != len(labels):
+            return {'error': 'texts and labels must be non-empty and of equal length'}
+
+        with self._train_lock:
+            models = self.models
+            if not self.training_history['trained'] or models is None:
+                return {'error': 'Models must be trained before they can be updated'}
+
+            try:
+                converted_labels = np.array([self.LABEL_MAP.get(l, 1) for l in labels])
+
+                # partial_fit can't add classes the models were not trained with
+                unseen = np.setdiff1d(converted_labels, models.nb_model.classes_)
+                if unseen.size:
+                    names = ', '.join(self.class_labels[c] for c in unseen)
+                    return {'error': f'Models were not trained with class(es) {names}; retrain instead'}
+
+                X = models.vectorizer.transform(texts)
+
+                # Update copies so concurrent analyses never see a half-updated model
+                nb_model, lr_model = copy.deepcopy(models.nb_model), copy.deepcopy(models.lr_model)
+                for model in (nb_model, lr_model):
+                    # Models loaded from disk are memory-mapped read-only; partial_fit updates in place
+                    for attr, value in vars(model).items():
+                        if isinstance(value, np.memmap):
+                            setattr(model, attr, np.array(value))
+                    model.partial_fit(X, converted_labels, classes=model.classes_)
+
+                training_history = {
+                    **self.training_history,
+                    'samples': self.training_history['samples'] + len(texts),
+                    'classes': nb_model.classes_.tolist()
+                }
+                self._swap_models(TrainedModels(models.vectorizer, nb_model, lr_model), training_history)
+
+                logger.info(f"✓ Models updated with {len(texts)} samples")
+                return training_history
+
+            except Exception as e:
+                logger.error(f"Error updating models: {e}")
+                return {'error': str(e)}
 
     def analyze_with_ml(self, text: str) -> Dict:
         """Analyze sentiment using trained ML models"""
-        if not self.vectorizer or not self.nb_model or not self.lr_model:
+        models = self.models
+        if models is None:
             return {}
 
+        # Results written by an analysis that started before a retrain carry the old generation
+        cache_key = text_key(text)
+        cached = self._ml_cache.get(cache_key)
+        if cached is not None and cached[0] == models.generation:
+            return cached[1]
+
         try:
-            X = self.vectorizer.transform([text])
+            X = models.vectorizer.transform([text])
 
-            nb_pred = self.nb_model.predict(X)[0]
-            nb_proba = self.nb_model.predict_proba(X)[0].max()
+            # One predict_proba per model; the prediction is its argmax
+            nb_probs = models.nb_model.predict_proba(X)[0]
+            nb_idx = int(nb_probs.argmax())
+            nb_pred, nb_proba = int(models.nb_model.classes_[nb_idx]), nb_probs[nb_idx]
 
-            lr_pred = self.lr_model.predict(X)[0]
-            lr_proba = self.lr_model.predict_proba(X)[0].max()
+            lr_probs = models.lr_model.predict_proba(X)[0]
+            lr_idx = int(lr_probs.argmax())
+            lr_pred, lr_proba = int(models.lr_model.classes_[lr_idx]), lr_probs[lr_idx]
 
             label_reverse = {0: 'Negative', 1: 'Neutral', 2: 'Positive'}
 
-            return {
+            result = {
                 'naive_bayes': {
                     'sentiment': label_reverse[nb_pred],
                     'confidence': float(nb_proba)
@@ -217,6 +545,8 @@ class SentimentAnalyzer:
                     'confidence': float(lr_proba)
                 }
             }
+            self._ml_cache.set(cache_key, (models.generation, result))
+            return result
         except Exception as e:
             logger.error(f"Error in ML analysis: {e}")
             return {}
@@ -251,8 +581,8 @@ class SentimentAnalyzer:
         except Exception as e:
             logger.error(f"Error during auto-training: {e}")
 
-    def analyze(self, text: str) -> Dict:
-        """Analyze sentiment using OpenAI API and ML models"""
+    def _build_result(self, text: str, gpt_result: Optional[Dict], ml_results: Dict) -> Dict:
+        """Combine OpenAI and ML model outputs into an analysis result"""
         result = {
             'text': text,
             'timestamp': datetime.now().isoformat(),
@@ -261,7 +591,6 @@ class SentimentAnalyzer:
         }
 
         # OpenAI GPT-4o-mini (Pre-trained model)
-        gpt_result = self.analyze_with_openai(text)
         if gpt_result:
             result['models']['pre_trained'] = gpt_result
         else:
@@ -273,8 +602,46 @@ class SentimentAnalyzer:
             }
 
         # ML Models (if trained)
+        result['models'].update(ml_results)
+
+        return result
+
+    async def analyze(self, text: str) -> Dict:
+        """Analyze sentiment using OpenAI API and ML models"""
         if self.training_history['trained']:
-            ml_results = self.analyze_with_ml(text)
-            result['models'].update(ml_results)
+            # sklearn inference is blocking; run it off the event loop while OpenAI responds
+            gpt_result, ml_results = await asyncio.gather(
+                self.analyze_with_openai(text),
+                asyncio.to_thread(self.analyze_with_ml, text)
+            )
+        else:
+            gpt_result, ml_results = await self.analyze_with_openai(text), {}
+        return self._build_result(text, gpt_result, ml_results)
+
+    async def _analyze_with_openai_batched(self, text: str) -> Optional[Dict]:
+        """Analyze via the micro-batcher, serving repeated texts from the cache"""
+        if not self.batcher:
+            logger.warning("OpenAI client not initialized")
+            return None
+
+        cached = await self._get_cached_openai(text)
+        if cached is not None:
+            return cached
 
+        result = await self.batcher.analyze(text)
+        if is_valid_result(result):
+            await self._set_cached_openai(text, result)
         return result
+
+    async def analyze_batch(self, texts: List[str]) -> List[Dict]:
+        """Analyze many texts; OpenAI calls are grouped with other concurrent requests"""
+        gpt_results = await asyncio.gather(*(self._analyze_with_openai_batched(t) for t in texts))
+
+        ml_results = [{}] * len(texts)
+        if self.training_history['trained']:
+            ml_results = await asyncio.to_thread(lambda: [self.analyze_with_ml(t) for t in texts])
+
+        return [
+            self._build_result(text, gpt_result, ml_result)
+            for text, gpt_result, ml_result in zip(texts, gpt_results, ml_results)
+        ]
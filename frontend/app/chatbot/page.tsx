@@ -5,6 +5,12 @@ import { chatbotAPI } from '@/lib/api'
 import Link from 'next/link'
 import { ArrowLeft, Send, RotateCcw, Upload, Loader, X } from 'lucide-react'
 
+// Indexing runs in the background after upload; poll until it finishes
+const UPLOAD_POLL_INTERVAL_MS = 1000
+const UPLOAD_POLL_TIMEOUT_MS = 5 * 60 * 1000
+
+const sleep = (ms: number) => new Promise(resolve => setTimeout(resolve, ms))
+
 interface Message {
   role: 'user' | 'assistant'
   content: string
@@ -101,7 +107,23 @@ export default function ChatbotPage() {
 
     try {
       const response = await chatbotAPI.uploadDocument(file)
-      setUploadedFile(file.name)
+      const documentId: string = response.data.document_id
+      const deadline = Date.now() + UPLOAD_POLL_TIMEOUT_MS
+
+      let status: string = response.data.status
+      while (status === 'processing' && Date.now() < deadline) {
+        await sleep(UPLOAD_POLL_INTERVAL_MS)
+        const statusResponse = await chatbotAPI.getUploadStatus(documentId)
+        status = statusResponse.data.status
+      }
+
+      if (status === 'completed') {
+        setUploadedFile(file.name)
+      } else if (status === 'processing') {
+        setError('Document is still being processed, please try again later')
+      } else {
+        setError('Failed to process document')
+      }
     } catch (err) {
       setError('Failed to upload document')
       console.error(err)
@@ -50,6 +50,9 @@ export const chatbotAPI = {
       },
     })
   },
+
+  getUploadStatus: (documentId: string) =>
+    api.get(`/chat/upload/${encodeURIComponent(documentId)}/status`),
 }
 
 export default api